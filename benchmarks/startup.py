@@ -0,0 +1,73 @@
+# Author: Neel Basak
+# Github: https://github.com/Neelfrost
+# File: startup.py
+# License: GPL-3
+
+# Measure the startup time of non-interactive mmas commands.
+# Usage: python benchmarks/startup.py [repeats]
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from statistics import median
+
+# Startup time budget for non-interactive commands, in milliseconds
+BUDGET = 100
+
+
+def measure(args, repeats):
+    """Run mmas with given arguments in a fresh interpreter and measure the wall-clock time.
+
+    Args:
+        args (List(str)): Command line arguments.
+        repeats (int): Number of runs.
+
+    Returns:
+        List(float): Time taken by each run in milliseconds.
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "mmas", *args],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    # Baseline: bare interpreter startup
+    start = time.perf_counter()
+    for _ in range(repeats):
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+    interpreter = (time.perf_counter() - start) * 1000 / repeats
+
+    print(f"Interpreter startup: {interpreter:.1f} ms")
+
+    with tempfile.TemporaryDirectory() as folder:
+        commands = {
+            "--help": ["--help"],
+            "--highlight-boundaries": ["--highlight-boundaries", folder],
+        }
+
+        failed = False
+        for name, args in commands.items():
+            timings = measure(args, repeats)
+            status = "ok" if median(timings) < BUDGET else "over budget"
+            failed |= status != "ok"
+            print(
+                f"mmas {name}: median {median(timings):.1f} ms, min {min(timings):.1f} ms ({status})"
+            )
+
+    sys.exit(failed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# Author: Neel Basak
+# Github: https://github.com/Neelfrost
+# File: anisotropy.py
+# License: GPL-3
+
+import numpy as np
+
+# Orientations are represented by a single angle (in degrees) within the fundamental zone of a cubic crystal,
+# misorientations therefore lie between 0 and half of it.
+FUNDAMENTAL_ZONE = 90
+
+# Largest number of orientations for which pair tables are stored densely. Beyond that, tables are stored as a
+# function of misorientation (sampled at RESOLUTION degrees) and looked up through the orientation angles.
+DENSE_LIMIT = 2048
+RESOLUTION = 0.01
+
+
+def random_angles(orientations):
+    """Assign a random angle to every orientation.
+
+    Args:
+        orientations (int): Highest orientation within the microstructure.
+
+    Returns:
+        ndarray: Angles in degrees indexed by orientation, index 0 is unused.
+
+    """
+    return np.random.uniform(0, FUNDAMENTAL_ZONE, size=orientations + 1)
+
+
+def misorientation(angle_a, angle_b):
+    """Calculate the misorientation between orientations, taking crystal symmetry into account.
+
+    Args:
+        angle_a (ndarray | float): Angles in degrees.
+        angle_b (ndarray | float): Angles in degrees.
+
+    Returns:
+        ndarray | float: Misorientation in degrees, between 0 and FUNDAMENTAL_ZONE / 2.
+
+    """
+    difference = np.abs(angle_a - angle_b) % FUNDAMENTAL_ZONE
+    return np.minimum(difference, FUNDAMENTAL_ZONE - difference)
+
+
+class ReadShockleyEnergy:
+    def __init__(self, grain_boundary_energy, max_misorientation=15):
+        """Read-Shockley grain boundary energy. Low angle boundaries have a lower energy, boundaries with a
+        misorientation above `max_misorientation` have the full grain boundary energy.
+
+        Args:
+            grain_boundary_energy (float): Energy of high angle grain boundaries.
+            max_misorientation (float): Misorientation (in degrees) separating low and high angle boundaries.
+        """
+        self.grain_boundary_energy = grain_boundary_energy
+        self.max_misorientation = max_misorientation
+
+    def __call__(self, misorientation):
+        ratio = np.clip(np.asarray(misorientation) / self.max_misorientation, 1e-12, 1)
+        return self.grain_boundary_energy * ratio * (1 - np.log(ratio))
+
+
+class HumphreysMobility:
+    def __init__(self, max_misorientation=15):
+        """Humphreys grain boundary mobility. Low angle boundaries are nearly immobile, boundaries with a
+        misorientation well above `max_misorientation` have the full mobility.
+
+        Args:
+            max_misorientation (float): Misorientation (in degrees) separating low and high angle boundaries.
+        """
+        self.max_misorientation = max_misorientation
+
+    def __call__(self, misorientation):
+        ratio = np.asarray(misorientation) / self.max_misorientation
+        return 1 - np.exp(-5 * ratio**4)
+
+
+ENERGY_MODELS = {"read-shockley": ReadShockleyEnergy}
+MOBILITY_MODELS = {"humphreys": HumphreysMobility}
+
+
+def create_models(data):
+    """Create energy and mobility models from their names. Uniform (isotropic) models are represented by None.
+
+    Args:
+        data (Dict): Dictionary containing the following data:
+            grain_boundary_energy
+            optionally: energy_model, mobility_model, max_misorientation
+
+    Returns:
+        Tuple(callable, callable): Energy model, mobility model.
+
+    """
+    max_misorientation = data.get("max_misorientation", 15)
+
+    energy_model = data.get("energy_model", "uniform")
+    if energy_model in ENERGY_MODELS:
+        energy_model = ENERGY_MODELS[energy_model](
+            data.get("grain_boundary_energy"), max_misorientation
+        )
+    else:
+        energy_model = None
+
+    mobility_model = data.get("mobility_model", "uniform")
+    if mobility_model in MOBILITY_MODELS:
+        mobility_model = MOBILITY_MODELS[mobility_model](max_misorientation)
+    else:
+        mobility_model = None
+
+    return energy_model, mobility_model
+
+
+class OrientationPairTable:
+    def __init__(self, model, angles):
+        """Lookup table of a model (energy, mobility) for every pair of orientations, built once.
+
+        The table is dense (orientations x orientations) for up to DENSE_LIMIT orientations. Beyond that, only the
+        model sampled over misorientation is stored, and pairs are looked up through their orientation angles.
+        Pairs of identical orientations, and pairs involving orientation 0 (outside the lattice), have a value of 0.
+
+        Args:
+            model (callable): Maps misorientation (in degrees) to a value.
+            angles (ndarray): Angles in degrees indexed by orientation.
+        """
+        self.angles = np.asarray(angles, dtype=np.float32)
+        self.dense = len(self.angles) <= DENSE_LIMIT
+
+        if self.dense:
+            self.table = np.asarray(
+                model(misorientation(self.angles[:, np.newaxis], self.angles)),
+                dtype=np.float32,
+            )
+            np.fill_diagonal(self.table, 0)
+            self.table[0, :] = 0
+            self.table[:, 0] = 0
+        else:
+            self.table = np.asarray(
+                model(np.arange(0, FUNDAMENTAL_ZONE / 2 + RESOLUTION, RESOLUTION)),
+                dtype=np.float32,
+            )
+
+        # Largest value, e.g., used to calculate relative mobilities
+        self.max = float(self.table.max())
+
+    def __getitem__(self, pair):
+        """Look up the value for pairs of orientations.
+
+        Args:
+            pair (Tuple(ndarray | int, ndarray | int)): Orientations.
+
+        Returns:
+            ndarray | float: Values for each pair.
+
+        """
+        orientation_a, orientation_b = pair
+
+        if self.dense:
+            return self.table[orientation_a, orientation_b]
+
+        bins = np.rint(
+            misorientation(self.angles[orientation_a], self.angles[orientation_b])
+            / RESOLUTION
+        ).astype(np.intp)
+        return np.where(
+            (orientation_a != orientation_b)
+            & (orientation_a != 0)
+            & (orientation_b != 0),
+            self.table[bins],
+            0,
+        )
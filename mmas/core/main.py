@@ -6,15 +6,15 @@
 import os
 import sys
 
-from mmas.core.matrix import Matrix2D
 from mmas.utils.parser import argparser
-from mmas.utils.edge_detection import process_microstructures
-from pkg_resources import resource_filename
-from tqdm import tqdm
+
+# Heavy dependencies (numpy, scipy, pygame, tqdm) are imported within the code paths that need them, so that
+# non-interactive commands start quickly.
 
 os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "hide"  # hide pygame startup banner
 
-import pygame as pg
+# Application window icon
+ICON = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "icon.png")
 
 
 def pad_left(content, amount):
@@ -50,35 +50,39 @@ def unique_name(options, time, extension):
     )
 
 
-def save_snapshot(canvas, width, cell_size, method, orientations, time, mcs):
-    """Pygame pygame.image.save wrapper.
+def save_snapshot(matrix, colored, width, cell_size, method, orientations, time, mcs):
+    """Save an image of the whole microstructure (the displayed slice of a volume).
+
+    Cells are drawn at their size in pixels, as in the window. Lattices that would not fit in the window are saved
+    at one pixel per cell instead.
 
     Args:
-        canvas (Surface): Pygame surface object.
+        matrix (Matrix2D | Matrix3D): Discrete matrix mapped to a microstructure.
+        colored (boolean): Should grains be colored?
         width (int): Window width in pixels.
         cell_size (int): Cell size.
         method (str): Total/maximum orientations possible within in the microstructure.
         orientations (int): Method used to create voronoi seeds.
         time (int): Time elapsed since start.
     """
-    pg.image.save(
-        canvas,
-        os.path.join(
-            os.path.abspath("."),
-            unique_name(
-                {
-                    "w": width,
-                    "c": cell_size,
-                    "m": method,
-                    "o": orientations,
-                    "mcs": pad_left(mcs, 4),
-                },
-                pad_left(time, 6),
-                "png",
-            ),
+    file_name = os.path.join(
+        os.path.abspath("."),
+        unique_name(
+            {
+                "w": width,
+                "c": cell_size,
+                "m": method,
+                "o": orientations,
+                "mcs": pad_left(mcs, 4),
+            },
+            pad_left(time, 6),
+            "png",
         ),
     )
 
+    scale = cell_size if max(matrix.cols, matrix.rows) * cell_size <= width else 1
+    matrix.snapshot(file_name, colored=colored, cell_size=scale)
+
 
 def main():
     # Parse arguments
@@ -87,20 +91,30 @@ def main():
 
     # Process microstructure snapshots to show only grain boundaries.
     if args.highlight_boundaries:
+        from mmas.utils.edge_detection import process_microstructures
+
         process_microstructures(args.highlight_boundaries)
         return
 
+    from mmas.core.matrix import Matrix2D
+    from mmas.core.matrix3d import Matrix3D
+
     # Framerate
     FRAMERATE = 60
 
     if args.load:
-        data = Matrix2D.load(args.load)
+        # 3D microstructures are saved in a binary format
+        Matrix = Matrix3D if args.load.endswith(".npz") else Matrix2D
+        data = Matrix.load(args.load)
         # Override simulation parameters if provided
         data.update(
             {
                 "temperature": args.temperature,
                 "grain_boundary_energy": args.grain_boundary_energy,
                 "boltz_const": args.boltz_const,
+                "energy_model": args.energy_model,
+                "mobility_model": args.mobility_model,
+                "max_misorientation": args.max_misorientation,
             }
         )
         WIDTH = data.get("rows") * data.get("grid_cell_size")
@@ -112,8 +126,8 @@ def main():
         # Size of a cell, lower = sharper edges
         GRID_CELL_SIZE = min(WIDTH, max(args.grid_cell_size, 1))
 
-        # Number of cols, rows
-        SIZE = WIDTH // GRID_CELL_SIZE
+        # Number of cols, rows. Lattices larger than the window are shown through a viewport.
+        SIZE = args.size if args.size else WIDTH // GRID_CELL_SIZE
 
         data = args_dict.copy()
         data.update(
@@ -124,29 +138,50 @@ def main():
             }
         )
 
+        if args.three_dimensional:
+            Matrix = Matrix3D
+            data["depth"] = SIZE
+        else:
+            Matrix = Matrix2D
+
     # Create microstructure
-    grid = Matrix2D(data)
+    grid = Matrix(data)
 
     if args.save:
         grid.save()
 
+    import pygame as pg
+    from mmas.core.scheduler import Scheduler
+    from mmas.core.stopping import StoppingCriteria
+    from mmas.core.viewport import Viewport
+    from mmas.core.worker import SimulationWorker
+    from tqdm import tqdm
+
     # Setup pygame
     pg.init()
     pg.display.set_caption("Microstructure Modeling & Simulation")
 
     # Set application window icon
-    pg.display.set_icon(
-        pg.image.load(resource_filename(__name__, "../assets/icon.png"))
-    )
+    pg.display.set_icon(pg.image.load(ICON))
+
+    # Keep the window within the screen, the viewport shows the rest of the lattice
+    screen = pg.display.Info()
+    if screen.current_w > 0 and screen.current_h > 0:
+        WIDTH = min(WIDTH, screen.current_w, screen.current_h)
 
     # Create canvas
     canvas = pg.display.set_mode((WIDTH, WIDTH))
 
+    # Create a viewport onto the lattice, zoomed out to fit when the lattice does not fit at its cell size
+    viewport = Viewport(WIDTH, WIDTH, grid.cols, grid.rows, zoom=GRID_CELL_SIZE)
+    if max(grid.cols, grid.rows) * GRID_CELL_SIZE > WIDTH:
+        viewport.fit()
+
     # Create clock
     clock = pg.time.Clock()
 
     # Draw matrix (microstructure) once to capture an image
-    grid.render(canvas, colored=args.color)
+    grid.render(canvas, colored=args.color, viewport=viewport)
 
     # Save the image of microstructure at current time
     if args.snapshot != 0:
@@ -155,7 +190,8 @@ def main():
         pg.time.set_timer(pg.USEREVENT, time_in_seconds * 1000)
 
         save_snapshot(
-            canvas,
+            grid,
+            args.color,
             WIDTH,
             GRID_CELL_SIZE,
             data.get("seed_method"),
@@ -164,25 +200,57 @@ def main():
             grid.simulator.mcs,
         )
 
+    # Advance the simulation on a background thread so that it is not throttled by (and does not stall) the display.
+    # Batches are sized in Monte Carlo steps, and auto-tuned to last about one frame.
+    scheduler = Scheduler(
+        grid.sites,
+        mcs_rate=args.mcs_rate,
+        time_budget=1 / FRAMERATE,
+        mcs_fraction=args.mcs_fraction,
+    )
+    criteria = StoppingCriteria(
+        max_mcs=args.max_mcs,
+        grain_size=args.grain_size,
+        energy_tolerance=args.energy_tolerance,
+        time_limit=args.time_limit,
+    )
+    worker = SimulationWorker(grid, scheduler, criteria, capture=viewport.capture)
+    if args.simulate:
+        worker.start()
+
+    def close():
+        worker.stop()
+        pg.quit()
+        sys.exit()
+
     with tqdm(
         bar_format="{desc} {elapsed}",
         desc="\N{ESC}[38;5;93;1m" + "Running..." + "\N{ESC}[0m",
     ) as pbar:
+        mcs = grid.simulator.mcs
         while True:
-            # Simulate grain growth
-            grid.simulate(simulate=args.simulate)
-
-            # Draw matrix (microstructure)
-            grid.render(canvas, colored=args.color)
-
-            # Handle pygame events
-            for event in pg.event.get():
-                if event.type == pg.USEREVENT and (
-                    args.snapshot != 0 and args.simulate
-                ):
-                    # Save the image of microstructure at current time
+            # Draw matrix (microstructure) using the latest lattice state. While the simulation runs, draw the latest
+            # frame published by the worker instead, so the display never waits for the batch in progress.
+            if worker.is_alive():
+                frame = worker.latest_frame()
+            else:
+                frame = viewport.sample(grid), grid.simulator.mcs
+            if frame is not None:
+                viewport.draw(canvas, grid.palette, frame[0], colored=args.color)
+                mcs = frame[1]
+
+            if args.simulate:
+                pg.display.set_caption(
+                    f"Microstructure Modeling & Simulation MCS: {mcs}"
+                )
+
+            # Stop once the simulation has converged, or has reached the point of interest
+            if worker.reason is not None:
+                if args.snapshot != 0:
+                    # Save the image of the final microstructure
                     save_snapshot(
-                        canvas,
+                        grid,
+                        args.color,
                         WIDTH,
                         GRID_CELL_SIZE,
                         data.get("seed_method"),
@@ -190,14 +258,48 @@ def main():
                         pg.time.get_ticks() // 1000,
                         grid.simulator.mcs,
                     )
+                pbar.close()
+                print(
+                    "\N{ESC}[38;5;93;1m"
+                    + "Simulation stopped: "
+                    + "\N{ESC}[0m"
+                    + worker.reason
+                )
+                close()
+
+            # Handle pygame events
+            for event in pg.event.get():
+                if event.type == pg.USEREVENT and (
+                    args.snapshot != 0 and args.simulate
+                ):
+                    # Save the image of microstructure at current time
+                    with worker.lock:
+                        save_snapshot(
+                            grid,
+                            args.color,
+                            WIDTH,
+                            GRID_CELL_SIZE,
+                            data.get("seed_method"),
+                            data.get("orientations"),
+                            pg.time.get_ticks() // 1000,
+                            grid.simulator.mcs,
+                        )
                 if event.type == pg.QUIT:
-                    pg.quit()
-                    sys.exit()
+                    close()
+                # Pan and zoom
+                if viewport.handle_event(event):
+                    continue
                 if event.type == pg.KEYDOWN:
                     # Close window when 'Esc' is pressed
                     if event.key == pg.K_ESCAPE:
-                        pg.quit()
-                        sys.exit()
+                        close()
+                    # Move through slices of a 3D microstructure
+                    if isinstance(grid, Matrix3D) and event.key in (
+                        pg.K_UP,
+                        pg.K_DOWN,
+                    ):
+                        grid.move_slice(1 if event.key == pg.K_UP else -1)
+                        viewport.invalidate()
 
             pg.display.update()
             clock.tick(FRAMERATE)
@@ -9,16 +9,12 @@ from math import ceil, log2
 from uuid import uuid4
 
 import numpy as np
+from mmas.core.anisotropy import create_models, random_angles
+from mmas.core.palette import Palette
 from mmas.core.simulation import Simulate
-from scipy.stats import qmc
-from tqdm import trange
 
 os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "hide"  # hide pygame startup banner
 
-import pygame as pg
-import pygame.gfxdraw as gfxdraw
-from pygame.math import Vector2
-
 
 class Matrix2D:
     def __init__(self, data):
@@ -29,7 +25,8 @@ class Matrix2D:
         Args:
             data (Dict): Dictionary containing the following data:
                 cols, rows, cell_size, orientations, seed_method, temperature, grain_boundary_energy, boltz_const
-                optionally: seeds, grid, grain_colors
+                optionally: periodic, seeds, grid, grain_colors, grain_angles, energy_model, mobility_model,
+                max_misorientation
 
         """
         self.cols = data.get("cols")
@@ -41,7 +38,13 @@ class Matrix2D:
         self.grain_boundary_energy = data.get("grain_boundary_energy")
         self.boltz_const = data.get("boltz_const")
 
-        # List of seed locations, List[Vector2(x, y),].
+        # Periodic boundaries: the matrix wraps around its edges (for both grain creation and simulation).
+        self.periodic = data.get("periodic", False)
+
+        # Number of lattice sites, i.e., reorientation attempts per Monte Carlo step.
+        self.sites = self.cols * self.rows
+
+        # List of seed locations, List[Tuple(x, y),].
         self.seeds = data.get("seeds", [])
 
         # Create a 2D array of size cols x rows initialized with zeros.
@@ -51,15 +54,29 @@ class Matrix2D:
         if not data.get("grid"):
             self.create_microstructure()
 
-        # Generate random/unique colors for each individual orientation.
-        self.grain_colors = data.get(
-            "grain_colors",
-            np.random.randint(0, 256, size=(max(map(max, self.grid)), 3)),
+        # Color lookup tables for every orientation, generated once unless they were loaded.
+        self.palette = Palette(len(self.seeds), data.get("grain_colors"))
+
+        # Angle of every orientation, used by misorientation dependent energy/mobility models.
+        grain_angles = data.get("grain_angles")
+        self.grain_angles = (
+            np.asarray(grain_angles)
+            if grain_angles is not None
+            else random_angles(len(self.seeds))
         )
 
+        # Energy/mobility models (None when uniform).
+        self.energy_model = data.get("energy_model", "uniform")
+        self.mobility_model = data.get("mobility_model", "uniform")
+        self.max_misorientation = data.get("max_misorientation", 15)
+
         # Create a simulator object to simulate grain growth/refinement.
         self.simulator = Simulate(
-            self, self.temperature, self.grain_boundary_energy, self.boltz_const
+            self,
+            self.temperature,
+            self.grain_boundary_energy,
+            self.boltz_const,
+            *create_models(data),
         )
 
     def create_seeds(self):
@@ -74,13 +91,16 @@ class Matrix2D:
 
             # Append seed locations
             for seed in seeds_itr:
+                seed = int(seed)
                 seed_x = int(seed / self.cols)
                 seed_y = seed % self.rows
                 self.grid[seed_x][seed_y] = seeds_itr.index + 1
-                self.seeds.append(Vector2(seed_x, seed_y))
+                self.seeds.append((seed_x, seed_y))
 
         # Low discrepancy seed selection
         else:
+            from scipy.stats import qmc
+
             # sobol's method
             if self.seed_method == "sobol":
                 seed_generator = qmc.Sobol(d=1, scramble=True)
@@ -105,7 +125,7 @@ class Matrix2D:
                 seed_x = int(seed / self.cols)
                 seed_y = seed % self.rows
                 self.grid[seed_x][seed_y] = seeds_itr.index + 1
-                self.seeds.append(Vector2(seed_x, seed_y))
+                self.seeds.append((seed_x, seed_y))
 
     def get_nearest_seed(self, x, y):
         """Calculates seed nearest to the current cell
@@ -115,16 +135,20 @@ class Matrix2D:
             y (int): y coordinate of current cell
 
         Returns:
-            Vector2: nearest seed
+            Tuple(int, int): nearest seed
 
         """
-        nearest_seed = Vector2()
+        nearest_seed = (0, 0)
         min_dist = self.cols * self.rows
 
         for seed in self.seeds:
-            distance_between_seed_and_current_cell = Vector2(x, y).distance_squared_to(
-                seed
-            )
+            dx, dy = abs(x - seed[0]), abs(y - seed[1])
+
+            # Distance to the nearest periodic image of the seed
+            if self.periodic:
+                dx, dy = min(dx, self.cols - dx), min(dy, self.rows - dy)
+
+            distance_between_seed_and_current_cell = dx**2 + dy**2
 
             if distance_between_seed_and_current_cell < min_dist:
                 min_dist = distance_between_seed_and_current_cell
@@ -135,6 +159,8 @@ class Matrix2D:
     def create_grains(self):
         """Create voronoi regions (grains) using the seed locations. Each region belongs to a specific crystallographic
         orientation."""
+        from tqdm import trange
+
         for i in trange(
             self.cols,
             ascii=" ∙□■",
@@ -146,79 +172,98 @@ class Matrix2D:
                     continue
 
                 nearest_seed = self.get_nearest_seed(i, j)
-                self.grid[i][j] = self.grid[int(nearest_seed.x)][int(nearest_seed.y)]
+                seed_x, seed_y = nearest_seed
+                self.grid[i][j] = self.grid[int(seed_x)][int(seed_y)]
 
     def create_microstructure(self):
         self.create_seeds()
         self.create_grains()
 
-    def get_grayscale(self, current_orientation):
-        """Basically maps the range (1, self.orientations) to (0, 255).
+    def surface(self, colored=False):
+        """Create a surface (one pixel per cell) from the matrix.
 
         Args:
-            current_orientation (int): Orientation value of current cell.
+            colored (boolean): Should grains be colored? Default: grayscale grains.
 
-        Returns: Tuple(int, int, int): Grayscale color corresponding to orientation of the cell.
+        Returns:
+            Surface: Pygame surface of size cols x rows.
+        """
+        import pygame as pg
+
+        return pg.surfarray.make_surface(
+            self.palette.apply(np.asarray(self.grid), colored)
+        )
 
+    def snapshot(self, file_name, colored=False, cell_size=1):
+        """Save the matrix as an image.
+
+        Args:
+            file_name (str): Path of the image.
+            colored (boolean): Should grains be colored? Default: grayscale grains.
+            cell_size (int, optional): Size of a cell in pixels. Default: 1.
         """
-        # Work around for sobol sequence:
-        if self.seed_method == "sobol":
-            max_orientations = len(self.seeds)
-        else:
-            max_orientations = self.orientations
+        import pygame as pg
 
-        shade = ((current_orientation - 1) * 255) // (max_orientations - 1)
-        return (shade, shade, shade)
+        surface = self.surface(colored)
+        if cell_size != 1:
+            surface = pg.transform.scale(
+                surface, (self.cols * cell_size, self.rows * cell_size)
+            )
+        pg.image.save(surface, file_name)
+
+    def region(self, x0, x1, y0, y1, step=1):
+        """Read a region of the matrix, taking every step-th cell. Only the region is converted to an array.
+
+        Args:
+            x0 (int): First column.
+            x1 (int): Last column (exclusive).
+            y0 (int): First row.
+            y1 (int): Last row (exclusive).
+            step (int, optional): Distance between sampled cells. Default: 1.
+
+        Returns:
+            ndarray: Orientations, shape: (columns, rows) of the region.
+        """
+        return np.array(
+            [row[y0:y1:step] for row in self.grid[x0:x1:step]], dtype=np.int64
+        ).reshape(len(range(x0, x1, step)), len(range(y0, y1, step)))
 
-    def render(self, canvas, colored=False):
+    def render(self, canvas, colored=False, viewport=None):
         """Draw the matrix (microstructure) with or without colored grains.
 
         Args:
             canvas (pygame.display): Pygame display.
-            cell_size (int): Size of cells.
             colored (boolean): Should grains be colored? Default: grayscale grains.
+            viewport (Viewport, optional): Draw only the part of the matrix within view. Default: whole matrix.
         """
-        if self.cell_size == 1:
-            for i in range(self.cols):
-                for j in range(self.rows):
-                    gfxdraw.pixel(
-                        canvas,
-                        i,
-                        j,
-                        self.grain_colors[min(self.grid[i][j], self.orientations - 1)]
-                        if colored
-                        else self.get_grayscale(self.grid[i][j]),
-                    )
-        else:
-            for i in range(self.cols):
-                for j in range(self.rows):
-                    pg.draw.rect(
-                        canvas,
-                        self.grain_colors[min(self.grid[i][j], self.orientations - 1)]
-                        if colored
-                        else self.get_grayscale(self.grid[i][j]),
-                        (
-                            i * self.cell_size,
-                            j * self.cell_size,
-                            self.cell_size,
-                            self.cell_size,
-                        ),
-                    )
-
-    def simulate(self, simulate=False):
+        import pygame as pg
+
+        if viewport is not None:
+            viewport.render(canvas, self, colored)
+            return
+
+        surface = self.surface(colored)
+        if self.cell_size != 1:
+            surface = pg.transform.scale(
+                surface, (self.cols * self.cell_size, self.rows * self.cell_size)
+            )
+        canvas.blit(surface, (0, 0))
+
+    def simulate(self, simulate=False, attempts=1000):
         """Simulate Monte Carlo Grain Growth.
 
         Args:
             simulate (boolean): Run simulation?
+            attempts (int): Number of reorientation attempts. One Monte Carlo step is `sites` attempts.
+
+        Returns:
+            int: Number of reorientation attempts made.
 
         """
         if not simulate:
-            return
+            return 0
 
-        pg.display.set_caption(
-            f"Microstructure Modeling & Simulation MCS: {self.simulator.mcs}"
-        )
-        for _ in range(1000):
+        for _ in range(attempts):
             self.simulator.reorient(
                 (
                     np.random.randint(0, self.cols),
@@ -226,6 +271,8 @@ class Matrix2D:
                 )
             )
 
+        return attempts
+
     def save(self):
         """Save the attributes of the matrix/microstructure as a json file in the current working directory."""
         file_name = f"mmas_{uuid4().hex}.json"
@@ -236,14 +283,20 @@ class Matrix2D:
             "grid_cell_size": self.cell_size,
             "orientations": self.orientations,
             "seed_method": self.seed_method,
+            "periodic": self.periodic,
             "grid": self.grid,
-            # Convert to list of list since Vector2 is not serializable
+            # Store seeds as a list of [x, y] pairs
             "seeds": list(map(list, self.seeds)),
             # Convert to list since ndarray is not serializable
-            "grain_colors": self.grain_colors.tolist(),
+            "grain_colors": self.palette.grain_colors.tolist(),
+            # Convert to list since ndarray is not serializable
+            "grain_angles": self.grain_angles.tolist(),
             "temperature": self.temperature,
             "grain_boundary_energy": self.grain_boundary_energy,
             "boltz_const": self.boltz_const,
+            "energy_model": self.energy_model,
+            "mobility_model": self.mobility_model,
+            "max_misorientation": self.max_misorientation,
         }
 
         with open(file_name, "w+") as file:
@@ -0,0 +1,348 @@
+# Author: Neel Basak
+# Github: https://github.com/Neelfrost
+# File: matrix3d.py
+# License: GPL-3
+
+import json
+import os
+from math import ceil, log2
+from uuid import uuid4
+
+import numpy as np
+from mmas.core.anisotropy import create_models, random_angles
+from mmas.core.palette import Palette
+from mmas.core.simulation import Simulate3D
+
+os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "hide"  # hide pygame startup banner
+
+
+class Matrix3D:
+    def __init__(self, data):
+        """Discrete volume constructor.
+
+        Each cell (voxel) of the volume belongs to a voronoi region i.e., a grain. The volume is stored as a compact
+        uint16/uint32 array, surrounded by a one cell thick border of zeros (no orientation) which is used by the
+        simulator in place of boundary checks.
+
+        Args:
+            data (Dict): Dictionary containing the following data:
+                cols, rows, depth, cell_size, orientations, seed_method, temperature, grain_boundary_energy, boltz_const
+                optionally: periodic, seeds, grid, grain_colors, grain_angles, energy_model, mobility_model,
+                max_misorientation
+
+        """
+        self.cols = data.get("cols")
+        self.rows = data.get("rows")
+        self.depth = data.get("depth")
+        self.cell_size = data.get("grid_cell_size")
+        self.orientations = data.get("orientations")
+        self.seed_method = data.get("seed_method")
+        self.temperature = data.get("temperature")
+        self.grain_boundary_energy = data.get("grain_boundary_energy")
+        self.boltz_const = data.get("boltz_const")
+
+        # Periodic boundaries: the volume wraps around its faces (for both grain creation and simulation).
+        self.periodic = data.get("periodic", False)
+
+        # Number of lattice sites, i.e., reorientation attempts per Monte Carlo step.
+        self.sites = self.cols * self.rows * self.depth
+
+        # Array of seed locations, shape: (seeds, 3).
+        self.seeds = np.asarray(data.get("seeds", np.empty((0, 3))), dtype=np.int64)
+
+        grid = data.get("grid")
+
+        # Padded volume, and a view of the volume without the padding.
+        self.padded = np.zeros(
+            (self.cols + 2, self.rows + 2, self.depth + 2),
+            dtype=self.orientation_dtype(
+                int(np.max(grid)) if grid is not None else self.seed_count()
+            ),
+        )
+        self.grid = self.padded[1:-1, 1:-1, 1:-1]
+
+        # Turn the empty volume into a voronoi diagram.
+        if grid is not None:
+            self.grid[...] = grid
+        else:
+            self.create_microstructure()
+
+        # Currently displayed slice (along the depth axis).
+        self.slice_index = self.depth // 2
+
+        # Color lookup tables for every orientation, generated once unless they were loaded.
+        self.palette = Palette(len(self.seeds), data.get("grain_colors"))
+
+        # Angle of every orientation, used by misorientation dependent energy/mobility models.
+        grain_angles = data.get("grain_angles")
+        self.grain_angles = (
+            np.asarray(grain_angles)
+            if grain_angles is not None
+            else random_angles(len(self.seeds))
+        )
+
+        # Energy/mobility models (None when uniform).
+        self.energy_model = data.get("energy_model", "uniform")
+        self.mobility_model = data.get("mobility_model", "uniform")
+        self.max_misorientation = data.get("max_misorientation", 15)
+
+        # Create a simulator object to simulate grain growth/refinement.
+        self.simulator = Simulate3D(
+            self,
+            self.temperature,
+            self.grain_boundary_energy,
+            self.boltz_const,
+            *create_models(data),
+        )
+
+    def seed_count(self):
+        """Number of seeds generated by the current seed method."""
+        # Work around for sobol sequence:
+        if self.seed_method == "sobol":
+            return 2 ** ceil(log2(self.orientations))
+        return self.orientations
+
+    @staticmethod
+    def orientation_dtype(orientations):
+        """Smallest unsigned integer type able to hold the given number of orientations."""
+        if orientations < np.iinfo(np.uint16).max:
+            return np.uint16
+        return np.uint32
+
+    def create_seeds(self):
+        """Randomly distribute seeds within the volume using various methods."""
+        dimensions = np.array([self.cols, self.rows, self.depth])
+
+        # pseudo random seed selection
+        if self.seed_method == "pseudo":
+            self.seeds = np.random.randint(0, dimensions, size=(self.orientations, 3))
+
+        # Low discrepancy seed selection
+        else:
+            from scipy.stats import qmc
+
+            # sobol's method
+            if self.seed_method == "sobol":
+                seed_generator = qmc.Sobol(d=3, scramble=True)
+                seeds = seed_generator.random_base2(m=ceil(log2(self.orientations)))
+            # halton's method
+            elif self.seed_method == "halton":
+                seed_generator = qmc.Halton(d=3, scramble=True)
+                seeds = seed_generator.random(n=self.orientations)
+            # latin-hypercude method
+            elif self.seed_method == "latin":
+                seed_generator = qmc.LatinHypercube(d=3)
+                seeds = seed_generator.random(n=self.orientations)
+
+            self.seeds = (seeds * dimensions).astype(np.int64)
+
+    def create_grains(self):
+        """Create voronoi regions (grains) using the seed locations. Each region belongs to a specific crystallographic
+        orientation.
+
+        Nearest seeds are found with a k-d tree, one plane of the volume at a time to bound memory usage.
+        """
+        from scipy.spatial import cKDTree
+        from tqdm import trange
+
+        # With periodic boundaries, distances are measured to the nearest periodic image of each seed
+        tree = cKDTree(
+            self.seeds,
+            boxsize=(self.cols, self.rows, self.depth) if self.periodic else None,
+        )
+
+        # Coordinates of every cell within a single plane (constant x)
+        plane = np.indices((self.rows, self.depth)).reshape(2, -1).T
+        coordinates = np.empty((len(plane), 3), dtype=np.int64)
+        coordinates[:, 1:] = plane
+
+        for i in trange(
+            self.cols,
+            ascii=" ∙□■",
+            bar_format="{desc} |{bar:50}| {elapsed}",
+            desc="\N{ESC}[38;5;93;1m" + "Generating microstructure..." + "\N{ESC}[0m",
+        ):
+            coordinates[:, 0] = i
+            _, nearest_seeds = tree.query(coordinates, workers=-1)
+            self.grid[i] = (nearest_seeds + 1).reshape(self.rows, self.depth)
+
+    def create_microstructure(self):
+        self.create_seeds()
+        self.create_grains()
+
+    def get_slice(self, index=None):
+        """Get a plane of the volume along the depth axis.
+
+        Args:
+            index (int, optional): Index of the plane. Default: currently displayed slice.
+
+        Returns:
+            ndarray: View of the plane, shape: (cols, rows).
+
+        """
+        if index is None:
+            index = self.slice_index
+        return self.grid[:, :, index]
+
+    def move_slice(self, amount):
+        """Move the displayed slice along the depth axis, clamped to the volume.
+
+        Args:
+            amount (int): Number of planes to move by.
+        """
+        self.slice_index = min(max(self.slice_index + amount, 0), self.depth - 1)
+
+    def slice_surface(self, index=None, colored=False):
+        """Create a surface (one pixel per cell) from a plane of the volume.
+
+        Args:
+            index (int, optional): Index of the plane. Default: currently displayed slice.
+            colored (boolean): Should grains be colored? Default: grayscale grains.
+
+        Returns:
+            Surface: Pygame surface of size cols x rows.
+        """
+        import pygame as pg
+
+        return pg.surfarray.make_surface(
+            self.palette.apply(self.get_slice(index), colored)
+        )
+
+    def region(self, x0, x1, y0, y1, step=1):
+        """Read a region of the currently displayed slice, taking every step-th cell.
+
+        Args:
+            x0 (int): First column.
+            x1 (int): Last column (exclusive).
+            y0 (int): First row.
+            y1 (int): Last row (exclusive).
+            step (int, optional): Distance between sampled cells. Default: 1.
+
+        Returns:
+            ndarray: View of the region, shape: (columns, rows) of the region.
+        """
+        return self.get_slice()[x0:x1:step, y0:y1:step]
+
+    def render(self, canvas, colored=False, viewport=None):
+        """Draw the currently displayed slice of the volume with or without colored grains.
+
+        Args:
+            canvas (pygame.display): Pygame display.
+            colored (boolean): Should grains be colored? Default: grayscale grains.
+            viewport (Viewport, optional): Draw only the part of the slice within view. Default: whole slice.
+        """
+        import pygame as pg
+
+        if viewport is not None:
+            viewport.render(canvas, self, colored)
+            return
+
+        surface = self.slice_surface(colored=colored)
+        if self.cell_size != 1:
+            surface = pg.transform.scale(
+                surface, (self.cols * self.cell_size, self.rows * self.cell_size)
+            )
+        canvas.blit(surface, (0, 0))
+
+    def snapshot(self, file_name, index=None, colored=False, cell_size=1):
+        """Save a plane of the volume as an image.
+
+        Args:
+            file_name (str): Path of the image.
+            index (int, optional): Index of the plane. Default: currently displayed slice.
+            colored (boolean): Should grains be colored? Default: grayscale grains.
+            cell_size (int, optional): Size of a cell in pixels. Default: 1.
+        """
+        import pygame as pg
+
+        surface = self.slice_surface(index, colored)
+        if cell_size != 1:
+            surface = pg.transform.scale(
+                surface, (self.cols * cell_size, self.rows * cell_size)
+            )
+        pg.image.save(surface, file_name)
+
+    def simulate(self, simulate=False, attempts=None):
+        """Simulate Monte Carlo Grain Growth, a slab of a sublattice (a fraction of a Monte Carlo step) at a time.
+
+        Args:
+            simulate (boolean): Run simulation?
+            attempts (int, optional): Number of reorientation attempts, rounded up to whole planes of a sublattice.
+                Default: the rest of the current sublattice.
+
+        Returns:
+            int: Number of reorientation attempts made.
+
+        """
+        if not simulate:
+            return 0
+
+        start = self.simulator.reorientation_attempts
+        self.simulator.step(attempts)
+        while attempts and self.simulator.reorientation_attempts - start < attempts:
+            self.simulator.step(
+                attempts - (self.simulator.reorientation_attempts - start)
+            )
+
+        return self.simulator.reorientation_attempts - start
+
+    def save(self):
+        """Save the attributes of the volume/microstructure as a binary (npz) file in the current working
+        directory."""
+        file_name = f"mmas_{uuid4().hex}.npz"
+
+        metadata = {
+            "cols": self.cols,
+            "rows": self.rows,
+            "depth": self.depth,
+            "grid_cell_size": self.cell_size,
+            "orientations": self.orientations,
+            "seed_method": self.seed_method,
+            "periodic": self.periodic,
+            "temperature": self.temperature,
+            "grain_boundary_energy": self.grain_boundary_energy,
+            "boltz_const": self.boltz_const,
+            "energy_model": self.energy_model,
+            "mobility_model": self.mobility_model,
+            "max_misorientation": self.max_misorientation,
+        }
+
+        with open(file_name, "wb") as file:
+            np.savez(
+                file,
+                metadata=json.dumps(metadata),
+                grid=self.grid,
+                seeds=self.seeds,
+                grain_colors=self.palette.grain_colors,
+                grain_angles=self.grain_angles,
+            )
+
+        print(
+            "\N{ESC}[38;5;93;1m"
+            + "Microstructure data saved as: "
+            + "\N{ESC}[0m"
+            + f"{os.path.relpath(file_name)}"
+        )
+
+    @staticmethod
+    def load(file_name):
+        """Load the attributes of the volume/microstructure from a binary (npz) file in the current working
+        directory."""
+        with np.load(file_name) as file:
+            print(
+                "\N{ESC}[38;5;93;1m"
+                + "Microstructure data loaded from: "
+                + "\N{ESC}[0m"
+                + f"{os.path.relpath(file_name)}"
+            )
+            data = json.loads(str(file["metadata"]))
+            data.update(
+                {
+                    "grid": file["grid"],
+                    "seeds": file["seeds"],
+                    "grain_colors": file["grain_colors"],
+                }
+            )
+            if "grain_angles" in file:
+                data["grain_angles"] = file["grain_angles"]
+            return data
@@ -0,0 +1,82 @@
+# Author: Neel Basak
+# Github: https://github.com/Neelfrost
+# File: palette.py
+# License: GPL-3
+
+import numpy as np
+
+
+class Palette:
+    def __init__(self, orientations, grain_colors=None):
+        """Color lookup tables mapping every orientation to an RGB color.
+
+        Tables are indexed directly by orientation, index 0 is unused (no orientation). Both the colored and the
+        grayscale table are built once, so switching between them does not require any recomputation.
+
+        Args:
+            orientations (int): Highest orientation within the microstructure.
+            grain_colors (List(List(int, int, int)), optional): Previously saved colors, missing colors are generated.
+        """
+        self.orientations = orientations
+
+        self.grain_colors = self.color_table(grain_colors)
+        self.grayscale_colors = self.grayscale_table()
+
+    def color_table(self, grain_colors=None):
+        """Generate random/unique colors for each individual orientation.
+
+        Args:
+            grain_colors (List(List(int, int, int)), optional): Colors to reuse.
+
+        Returns:
+            ndarray: Colors indexed by orientation, shape: (orientations + 1, 3).
+
+        """
+        table = np.random.randint(0, 256, size=(self.orientations + 1, 3)).astype(
+            np.uint8
+        )
+
+        if grain_colors is not None and len(grain_colors):
+            grain_colors = np.asarray(grain_colors, dtype=np.uint8)[: len(table)]
+            table[: len(grain_colors)] = grain_colors
+
+        return table
+
+    def grayscale_table(self):
+        """Basically maps the range (1, orientations) to (0, 255).
+
+        Returns:
+            ndarray: Grayscale colors indexed by orientation, shape: (orientations + 1, 3).
+
+        """
+        shades = (
+            (np.arange(self.orientations + 1) - 1).clip(0)
+            * 255
+            // max(self.orientations - 1, 1)
+        )
+        return np.repeat(shades[:, np.newaxis], 3, axis=1).astype(np.uint8)
+
+    def table(self, colored=False):
+        """Get the lookup table for the given color mode.
+
+        Args:
+            colored (boolean): Colored grains? Default: grayscale grains.
+
+        Returns:
+            ndarray: Colors indexed by orientation.
+
+        """
+        return self.grain_colors if colored else self.grayscale_colors
+
+    def apply(self, grid, colored=False):
+        """Map a grid of orientations to RGB colors.
+
+        Args:
+            grid (ndarray): Orientations, any shape.
+            colored (boolean): Colored grains? Default: grayscale grains.
+
+        Returns:
+            ndarray: RGB colors, shape: grid.shape + (3,).
+
+        """
+        return self.table(colored)[grid]
@@ -0,0 +1,107 @@
+# Author: Neel Basak
+# Github: https://github.com/Neelfrost
+# File: scheduler.py
+# License: GPL-3
+
+import time
+from math import ceil
+
+
+class Scheduler:
+    def __init__(self, sites, mcs_rate=0, time_budget=1 / 60, mcs_fraction=None):
+        """Size simulation batches in terms of Monte Carlo steps (MCS) rather than a fixed number of attempts.
+
+        Each batch is sized to take roughly `time_budget` seconds, based on the measured reorientation throughput.
+        Alternatively, the simulation can advance in fixed fractions of an MCS, each split into batches that still fit
+        the time budget. When `mcs_rate` is set, batches are additionally throttled so that the simulation advances at
+        that many MCS per second.
+
+        Args:
+            sites (int): Number of lattice sites, i.e., reorientation attempts per MCS.
+            mcs_rate (float, optional): Target MCS per second. Default: 0 (as fast as possible).
+            time_budget (float, optional): Wall-clock time per batch in seconds. Default: one frame at 60 FPS.
+            mcs_fraction (float, optional): Advance the simulation in fixed fractions of an MCS. Default: none.
+        """
+        self.sites = sites
+        self.mcs_rate = mcs_rate
+        self.time_budget = time_budget
+        self.mcs_fraction = mcs_fraction
+
+        # Attempts left in the current fixed fraction of an MCS
+        self.remaining = 0
+
+        # Measured reorientation attempts per second (exponential moving average)
+        self.throughput = None
+        self.smoothing = 0.2
+
+        self.attempts = 0
+        self.start_time = None
+
+    def batch_size(self):
+        """Number of reorientation attempts to make in the next batch.
+
+        Returns:
+            int: Batch size, at least 1.
+
+        """
+        if self.throughput is None:
+            # Probe the throughput with a small batch
+            size = min(self.sites, 1000)
+        else:
+            size = self.throughput * self.time_budget
+
+        if self.mcs_fraction:
+            # Start the next fixed fraction of an MCS once the current one is done, and never run past it
+            if self.remaining <= 0:
+                self.remaining += self.mcs_fraction * self.sites
+            size = min(size, self.remaining)
+
+        if self.mcs_rate:
+            # Never run more than one time budget's worth of MCS ahead of the target rate
+            size = min(size, self.mcs_rate * self.sites * self.time_budget)
+
+        return max(int(ceil(size)), 1)
+
+    def record(self, attempts, elapsed):
+        """Record a completed batch, and update the measured throughput.
+
+        Args:
+            attempts (int): Number of reorientation attempts made.
+            elapsed (float): Wall-clock time taken by the batch in seconds.
+        """
+        if self.start_time is None:
+            self.start_time = time.perf_counter() - elapsed
+        self.attempts += attempts
+        if self.mcs_fraction:
+            self.remaining -= attempts
+
+        if elapsed <= 0:
+            return
+
+        throughput = attempts / elapsed
+        if self.throughput is None:
+            self.throughput = throughput
+        else:
+            self.throughput += self.smoothing * (throughput - self.throughput)
+
+    def step_complete(self):
+        """Whether the last batch completed a fixed fraction of an MCS.
+
+        Returns:
+            bool: Always True when the simulation does not advance in fixed fractions of an MCS.
+
+        """
+        return not self.mcs_fraction or self.remaining <= 0
+
+    def delay(self):
+        """Time to wait before the next batch so that the simulation does not run ahead of the target MCS rate.
+
+        Returns:
+            float: Delay in seconds, 0 when not throttled.
+
+        """
+        if not self.mcs_rate or self.start_time is None:
+            return 0
+
+        target_time = self.attempts / (self.mcs_rate * self.sites)
+        return max(target_time - (time.perf_counter() - self.start_time), 0)
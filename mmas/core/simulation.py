@@ -3,15 +3,124 @@
 # File: simulation.py
 # License: GPL-3
 
-from math import exp
+from math import ceil, exp
 
 import numpy as np
+from mmas.core.anisotropy import OrientationPairTable
+
+
+def neighbor_pairs(grid, periodic=False):
+    """Iterate over all pairs of neighboring lattice sites (Moore neighborhood), one offset at a time.
+
+    Every pair is visited once by comparing the lattice with shifted copies of itself along half of the Moore
+    offsets, the other half being the same pairs seen from the opposite site.
+
+    Args:
+        grid (ndarray): 2D or 3D lattice of orientations.
+        periodic (boolean, optional): Also include pairs across the (wrapped) edges of the lattice.
+
+    Yields:
+        Tuple(ndarray, ndarray): Orientations of sites, orientations of their neighbors at the current offset.
+
+    """
+    for offset in np.ndindex(*(3,) * grid.ndim):
+        offset = tuple(o - 1 for o in offset)
+        # Skip the site itself, and offsets pointing "backwards"
+        if offset <= (0,) * grid.ndim:
+            continue
+
+        if periodic:
+            yield grid, np.roll(grid, offset, axis=tuple(range(grid.ndim)))
+            continue
+
+        site = tuple(
+            slice(max(-o, 0), n - max(o, 0)) for o, n in zip(offset, grid.shape)
+        )
+        neighbor = tuple(
+            slice(max(o, 0), n - max(-o, 0)) for o, n in zip(offset, grid.shape)
+        )
+        yield grid[site], grid[neighbor]
+
+
+def unlike_neighbor_pairs(grid, periodic=False):
+    """Count pairs of neighboring lattice sites (Moore neighborhood) with different orientations.
+
+    Args:
+        grid (ndarray): 2D or 3D lattice of orientations.
+        periodic (boolean, optional): Also count pairs across the (wrapped) edges of the lattice.
+
+    Returns:
+        int: Number of unlike neighbor pairs.
+
+    """
+    return sum(
+        int(np.count_nonzero(sites != neighbors))
+        for sites, neighbors in neighbor_pairs(grid, periodic)
+    )
+
+
+def pair_energy(grid, energy, periodic=False):
+    """Sum the grain boundary energy of all pairs of neighboring lattice sites (Moore neighborhood).
+
+    Args:
+        grid (ndarray): 2D or 3D lattice of orientations.
+        energy (OrientationPairTable): Grain boundary energy of every pair of orientations.
+        periodic (boolean, optional): Also include pairs across the (wrapped) edges of the lattice.
+
+    Returns:
+        float: Total grain boundary energy.
+
+    """
+    return sum(
+        float(np.sum(energy[sites, neighbors], dtype=np.float64))
+        for sites, neighbors in neighbor_pairs(grid, periodic)
+    )
+
+
+def pair_tables(angles, energy_model=None, mobility_model=None):
+    """Build lookup tables for the given energy and mobility models.
+
+    Args:
+        angles (ndarray): Angles in degrees indexed by orientation.
+        energy_model (callable, optional): Grain boundary energy as a function of misorientation.
+        mobility_model (callable, optional): Grain boundary mobility as a function of misorientation.
+
+    Returns:
+        Tuple(OrientationPairTable, OrientationPairTable): Energy and mobility tables, None for uniform models.
+
+    """
+    return tuple(
+        OrientationPairTable(model, angles) if model is not None else None
+        for model in (energy_model, mobility_model)
+    )
+
+
+def mean_grain_size(grid):
+    """Calculate mean grain size, as the average number of lattice sites per grain.
+
+    Args:
+        grid (ndarray): 2D or 3D lattice of orientations.
+
+    Returns:
+        float: Mean grain area (2D) or volume (3D) in lattice sites.
+
+    """
+    grains = np.count_nonzero(np.bincount(grid.ravel()))
+    return grid.size / grains
 
 
 class Simulate:
-    def __init__(self, matrix, temperature, grain_boundary_energy, boltz_const):
+    def __init__(
+        self,
+        matrix,
+        temperature,
+        grain_boundary_energy,
+        boltz_const,
+        energy_model=None,
+        mobility_model=None,
+    ):
         """Simulate grain growth using Monte Carlo method.
-        Assumption: Uniform mobilities and energies.
+        Assumption: Uniform mobilities and energies, unless energy/mobility models are given.
         Neighborhood: Moore
 
         Args:
@@ -19,6 +128,8 @@ class Simulate:
             temperature (float): Simulation temperature.
             grain_boundary_energy (float): Grain boundary energy.
             boltz_const (float): Boltzmann constant.
+            energy_model (callable, optional): Grain boundary energy as a function of misorientation.
+            mobility_model (callable, optional): Grain boundary mobility as a function of misorientation.
         """
         self.matrix = matrix
 
@@ -26,11 +137,47 @@ class Simulate:
         self.grain_boundary_energy = grain_boundary_energy
         self.boltz_const = boltz_const
 
+        # Lookup tables of energy/mobility for every pair of orientations, None when uniform.
+        self.energy, self.mobility = pair_tables(
+            matrix.grain_angles, energy_model, mobility_model
+        )
+
         self.nearest_neighbors = 8
 
         self.reorientation_attempts = 0
         self.mcs = 0
 
+    def neighbor_sites(self, lattice_site):
+        """Coordinates of the neighbors (Moore configuration) of lattice site.
+
+        Neighbors outside the matrix are skipped, unless the matrix has periodic boundaries in which case
+        coordinates wrap around the edges.
+
+        Args:
+            lattice_site (Tuple(int, int)): Coordinates of lattice site.
+
+        Returns:
+            List(Tuple(int, int)): Coordinates of neighbors.
+
+        """
+        x, y = lattice_site
+        cols, rows = self.matrix.cols, self.matrix.rows
+
+        if self.matrix.periodic:
+            return [
+                ((x + i) % cols, (y + j) % rows)
+                for i in (-1, 0, 1)
+                for j in (-1, 0, 1)
+                if i or j
+            ]
+
+        return [
+            (i, j)
+            for i in range(max(0, x - 1), min(x + 1, cols - 1) + 1)
+            for j in range(max(0, y - 1), min(y + 1, rows - 1) + 1)
+            if i != x or j != y
+        ]
+
     def different_neighbors(self, lattice_site, orientation=None):
         """Calculate different neighbors (lattice sites with different orientation) of lattice site, or different
         neighbors of given lattice site with given orientation.
@@ -50,25 +197,17 @@ class Simulate:
         orientations = []
 
         # Iterate over neighbors (Moore configuration)
-        for i in range(
-            max(0, lattice_site[0] - 1),
-            min(lattice_site[0] + 1, self.matrix.cols - 1) + 1,
-        ):
-            for j in range(
-                max(0, lattice_site[1] - 1),
-                min(lattice_site[1] + 1, self.matrix.rows - 1) + 1,
-            ):
-                if i != lattice_site[0] or j != lattice_site[1]:
-                    if orientation is not None:
-                        if self.matrix.grid[i][j] != orientation:
-                            total_different_neighbors += 1
-                    else:
-                        if (
-                            self.matrix.grid[i][j]
-                            != self.matrix.grid[lattice_site[0]][lattice_site[1]]
-                        ):
-                            total_different_neighbors += 1
-                            orientations.append(self.matrix.grid[i][j])
+        for i, j in self.neighbor_sites(lattice_site):
+            if orientation is not None:
+                if self.matrix.grid[i][j] != orientation:
+                    total_different_neighbors += 1
+            else:
+                if (
+                    self.matrix.grid[i][j]
+                    != self.matrix.grid[lattice_site[0]][lattice_site[1]]
+                ):
+                    total_different_neighbors += 1
+                    orientations.append(self.matrix.grid[i][j])
         # Remove duplicates
         orientations = list(set(orientations))
 
@@ -86,6 +225,18 @@ class Simulate:
             float: Free energy of the given lattice site.
 
         """
+        if self.energy is not None:
+            if orientation is None:
+                orientation = self.matrix.grid[lattice_site[0]][lattice_site[1]]
+
+            # Sum of grain boundary energies with each neighbor
+            return float(
+                sum(
+                    self.energy[orientation, self.matrix.grid[i][j]]
+                    for i, j in self.neighbor_sites(lattice_site)
+                )
+            )
+
         # Calculate current free energy
         free_energy = (
             self.grain_boundary_energy
@@ -123,6 +274,10 @@ class Simulate:
         Returns:
             None
         """
+        # Increase reorientation attempts for each attempt, and calculate Monte Carlo steps
+        self.reorientation_attempts += 1
+        self.mcs = self.reorientation_attempts // (self.matrix.rows * self.matrix.cols)
+
         # Calculate current free energy
         current_free_energy = self.calculate_free_energy(lattice_site)
 
@@ -135,6 +290,15 @@ class Simulate:
         # Select a random orientation out of the orientations of the current neighbors
         new_orientation = np.random.choice(orientations)
 
+        # Boundaries with a lower mobility are proportionally less likely to migrate
+        if self.mobility is not None and np.random.uniform(0, 1) >= (
+            self.mobility[
+                self.matrix.grid[lattice_site[0]][lattice_site[1]], new_orientation
+            ]
+            / self.mobility.max
+        ):
+            return
+
         # Calculate free energy with orientation
         new_free_energy = self.calculate_free_energy(lattice_site, new_orientation)
 
@@ -142,11 +306,313 @@ class Simulate:
         delta_free_energy = new_free_energy - current_free_energy
 
         # Assign new orientation if free energy is lower or transition probability is favorable
-        # Increase reorientation attempts for each attempt, and calculate Monte Carlo steps
         if self.transition_probability(delta_free_energy):
             self.matrix.grid[lattice_site[0]][lattice_site[1]] = new_orientation
-            self.reorientation_attempts += 1
 
-        self.mcs = self.reorientation_attempts // (self.matrix.rows * self.matrix.cols)
+    def total_energy(self):
+        """Calculate the total grain boundary energy of the lattice.
 
+        Returns:
+            float: Grain boundary energy times the number of unlike neighbor pairs.
+
+        """
+        if self.energy is not None:
+            return pair_energy(
+                np.asarray(self.matrix.grid), self.energy, self.matrix.periodic
+            )
+        return self.grain_boundary_energy * unlike_neighbor_pairs(
+            np.asarray(self.matrix.grid), self.matrix.periodic
+        )
+
+    def mean_grain_size(self):
+        """Calculate mean grain area in lattice sites."""
+        return mean_grain_size(np.asarray(self.matrix.grid))
+
+
+class Simulate3D:
+    # Offsets of the 26 neighbors of a lattice site (3D Moore neighborhood)
+    NEIGHBOR_OFFSETS = tuple(
+        (dx, dy, dz)
+        for dx in (-1, 0, 1)
+        for dy in (-1, 0, 1)
+        for dz in (-1, 0, 1)
+        if (dx, dy, dz) != (0, 0, 0)
+    )
+
+    def __init__(
+        self,
+        matrix,
+        temperature,
+        grain_boundary_energy,
+        boltz_const,
+        energy_model=None,
+        mobility_model=None,
+    ):
+        """Simulate grain growth in a volume using a vectorized (sublattice-parallel) Monte Carlo method.
+        Assumption: Uniform mobilities and energies, unless energy/mobility models are given.
+        Neighborhood: Moore (26 neighbors)
+
+        Args:
+            matrix (Matrix3D): Discrete volume mapped to a microstructure.
+            temperature (float): Simulation temperature.
+            grain_boundary_energy (float): Grain boundary energy.
+            boltz_const (float): Boltzmann constant.
+            energy_model (callable, optional): Grain boundary energy as a function of misorientation.
+            mobility_model (callable, optional): Grain boundary mobility as a function of misorientation.
+        """
+        self.matrix = matrix
+
+        self.temperature = temperature
+        self.grain_boundary_energy = grain_boundary_energy
+        self.boltz_const = boltz_const
+
+        # Lookup tables of energy/mobility for every pair of orientations, None when uniform.
+        self.energy, self.mobility = pair_tables(
+            matrix.grain_angles, energy_model, mobility_model
+        )
+
+        self.nearest_neighbors = 26
+
+        self.reorientation_attempts = 0
+        self.mcs = 0
+
+        self.rng = np.random.default_rng()
+
+        # Interleaved sublattices. No two sites of the same sublattice are neighbors, so all sites of a sublattice can be
+        # reoriented at once without changing each other's free energy.
+        self.sublattices = self.create_sublattices()
+
+        # Sublattices are visited in a random order within each Monte Carlo step
+        self.sublattice_order = self.rng.permutation(len(self.sublattices))
+        self.current_sublattice = 0
+
+        # Sublattices are reoriented in slabs along x, index of the next plane of the current sublattice
+        self.current_plane = 0
+
+        # Transition probability for every possible change in the number of different neighbors
+        self.acceptance = self.acceptance_table()
+
+    def acceptance_table(self):
+        """Tabulate the transition probability for every possible change in different neighbors (-26 to 26).
+
+        Returns:
+            ndarray: Transition probabilities, indexed by (change in different neighbors + 26).
+
+        """
+        delta_free_energy = (
+            np.arange(-self.nearest_neighbors, self.nearest_neighbors + 1)
+            * self.grain_boundary_energy
+        )
+
+        if self.temperature != 0:
+            probability = np.exp(
+                np.minimum(
+                    -delta_free_energy / (self.boltz_const * self.temperature), 0
+                )
+            )
+        else:
+            probability = (delta_free_energy <= 0).astype(np.float64)
+
+        return probability.astype(np.float32)
+
+    def create_sublattices(self):
+        """Split the volume into sublattices, i.e., every other site along each axis.
+
+        With periodic boundaries, the first and last planes along an odd dimension are neighbors even though both have
+        an even index, so the last plane is split off into a sublattice of its own. This gives up to 27 sublattices
+        instead of 8, the extra ones are a single plane thick.
+
+        Returns:
+            List(Tuple(slice, slice, slice)): Slices into Matrix3D.grid selecting all sites of each sublattice.
+
+        """
+        classes = []
+        for n in self.matrix.grid.shape:
+            if self.matrix.periodic and n % 2 and n > 1:
+                classes.append((slice(0, n - 1, 2), slice(1, n, 2), slice(n - 1, n, 2)))
+            else:
+                classes.append((slice(0, n, 2), slice(1, n, 2)))
+
+        return [(x, y, z) for x in classes[0] for y in classes[1] for z in classes[2]]
+
+    def neighbor_slices(self, sublattice, offset):
+        """Slices selecting the neighbor at the given offset of every site of a sublattice from the padded volume.
+
+        Args:
+            sublattice (Tuple(slice, slice, slice)): Slices selecting the sublattice from Matrix3D.grid.
+            offset (Tuple(int, int, int)): Offset of the neighbor.
+
+        Returns:
+            Tuple(slice, slice, slice): Slices into Matrix3D.padded.
+
+        """
+        return tuple(
+            slice(1 + s.start + d, 1 + s.stop + d, s.step)
+            for s, d in zip(sublattice, offset)
+        )
+
+    def wrap_padding(self):
+        """Copy the faces of the volume into the padding on the opposite side (periodic boundaries).
+
+        Only the one cell thick padding is written, neighbors are still read through strided views of the padded
+        volume. Axes are wrapped one after another so that edges and corners of the padding are filled as well.
+        """
+        padded = self.matrix.padded
+        for axis in range(padded.ndim):
+            padded.swapaxes(0, axis)[0] = padded.swapaxes(0, axis)[-2]
+            padded.swapaxes(0, axis)[-1] = padded.swapaxes(0, axis)[1]
+
+    def transition_probability(self, sublattice, sites, new_orientations):
+        """Calculate transition probability of reorienting every site of a sublattice.
+
+        With uniform energies the change in free energy only depends on the change in the number of different
+        neighbors, whose transition probabilities are tabulated. Otherwise, the change in free energy is summed from
+        the energy table. Probabilities are scaled by the relative mobility of the boundary when a mobility model is
+        used.
+
+        Args:
+            sublattice (Tuple(slice, slice, slice)): Slices selecting the sublattice from Matrix3D.grid.
+            sites (ndarray): Current orientations of the sublattice.
+            new_orientations (ndarray): Proposed orientations of the sublattice.
+
+        Returns:
+            ndarray: Transition probabilities.
+
+        """
+        padded = self.matrix.padded
+
+        if self.energy is None:
+            # Change in the number of different neighbors
+            delta_different_neighbors = np.zeros(sites.shape, dtype=np.int8)
+            for offset in self.NEIGHBOR_OFFSETS:
+                neighbors = padded[self.neighbor_slices(sublattice, offset)]
+                delta_different_neighbors += neighbors != new_orientations
+                delta_different_neighbors -= neighbors != sites
+
+            probability = self.acceptance[
+                delta_different_neighbors + self.nearest_neighbors
+            ]
+        else:
+            # Change in free energy
+            delta_free_energy = np.zeros(sites.shape, dtype=np.float32)
+            for offset in self.NEIGHBOR_OFFSETS:
+                neighbors = padded[self.neighbor_slices(sublattice, offset)]
+                delta_free_energy += self.energy[new_orientations, neighbors]
+                delta_free_energy -= self.energy[sites, neighbors]
+
+            if self.temperature != 0:
+                probability = np.exp(
+                    np.minimum(
+                        -delta_free_energy / (self.boltz_const * self.temperature), 0
+                    )
+                )
+            else:
+                probability = (delta_free_energy <= 0).astype(np.float32)
+
+        if self.mobility is not None:
+            probability = probability * (
+                self.mobility[sites, new_orientations] / self.mobility.max
+            )
+
+        return probability
+
+    def reorient_sublattice(self, sublattice):
+        """Attempt to reorient every site of a sublattice (or of a slab of one) at once.
+
+        Each site proposes the orientation of a randomly chosen neighbor. Sites outside the volume (orientation 0)
+        differ from both the current and the proposed orientation, so they do not contribute to the change in free
+        energy. With periodic boundaries the padding mirrors the opposite faces of the volume instead.
+
+        Args:
+            sublattice (Tuple(slice, slice, slice)): Slices selecting the sublattice from Matrix3D.grid.
+
+        Returns:
+            int: Number of accepted reorientations.
+        """
+        if self.matrix.periodic:
+            self.wrap_padding()
+
+        padded = self.matrix.padded
+        sites = self.matrix.grid[sublattice]
+
+        # Select a random neighbor of each site, and propose its orientation
+        choice = self.rng.integers(
+            0, self.nearest_neighbors, size=sites.shape, dtype=np.uint8
+        )
+        new_orientations = np.zeros_like(sites)
+        for index, offset in enumerate(self.NEIGHBOR_OFFSETS):
+            np.copyto(
+                new_orientations,
+                padded[self.neighbor_slices(sublattice, offset)],
+                where=choice == index,
+            )
+
+        # Assign new orientation if free energy is lower or transition probability is favorable
+        accepted = self.rng.random(
+            sites.shape, dtype=np.float32
+        ) < self.transition_probability(sublattice, sites, new_orientations)
+        accepted &= (new_orientations != 0) & (new_orientations != sites)
+        np.copyto(sites, new_orientations, where=accepted)
+
+        self.reorientation_attempts += sites.size
+
+        return int(np.count_nonzero(accepted))
+
+    def step(self, attempts=None):
+        """Reorient the next slab of the current sublattice. Visiting all sublattices completes one Monte Carlo step.
+
+        Any subset of a sublattice is non-neighboring as well, so a sublattice can be reoriented a few planes (along x)
+        at a time. This keeps the unit of work small for large volumes.
+
+        Args:
+            attempts (int, optional): Number of sites to reorient, rounded up to whole planes of the sublattice.
+                Default: the rest of the current sublattice.
+
+        Returns:
+            int: Number of accepted reorientations.
+        """
+        sublattice = self.sublattices[self.sublattice_order[self.current_sublattice]]
+        cols, rows, depth = self.matrix.grid.shape
+        planes = range(cols)[sublattice[0]]
+        plane_sites = len(range(rows)[sublattice[1]]) * len(range(depth)[sublattice[2]])
+
+        count = len(planes) - self.current_plane
+        if attempts is not None and plane_sites:
+            count = min(count, max(ceil(attempts / plane_sites), 1))
+
+        accepted = 0
+        if count > 0:
+            slab = slice(
+                planes[self.current_plane],
+                planes[self.current_plane + count - 1] + 1,
+                planes.step,
+            )
+            accepted = self.reorient_sublattice((slab,) + sublattice[1:])
+            self.current_plane += count
+
+        if self.current_plane >= len(planes):
+            self.current_plane = 0
+            self.current_sublattice += 1
+            if self.current_sublattice == len(self.sublattices):
+                self.current_sublattice = 0
+                self.sublattice_order = self.rng.permutation(len(self.sublattices))
+                self.mcs += 1
+
+        return accepted
+
+    def total_energy(self):
+        """Calculate the total grain boundary energy of the volume.
+
+        Returns:
+            float: Grain boundary energy times the number of unlike neighbor pairs.
+
+        """
+        if self.energy is not None:
+            return pair_energy(self.matrix.grid, self.energy, self.matrix.periodic)
+        return self.grain_boundary_energy * unlike_neighbor_pairs(
+            self.matrix.grid, self.matrix.periodic
+        )
 
+    def mean_grain_size(self):
+        """Calculate mean grain volume in lattice sites."""
+        return mean_grain_size(self.matrix.grid)
@@ -0,0 +1,73 @@
+# Author: Neel Basak
+# Github: https://github.com/Neelfrost
+# File: stopping.py
+# License: GPL-3
+
+import time
+
+
+class StoppingCriteria:
+    def __init__(self, max_mcs=0, grain_size=0, energy_tolerance=0, time_limit=0):
+        """Decide when a simulation has progressed far enough to stop. A criterion set to 0 is disabled.
+
+        Grain size and energy are computed over the whole lattice, so they are only checked once per Monte Carlo step.
+
+        Args:
+            max_mcs (int, optional): Stop after this many Monte Carlo steps.
+            grain_size (float, optional): Stop once the mean grain size (in lattice sites) reaches this value.
+            energy_tolerance (float, optional): Stop once the relative change in total energy over one Monte Carlo
+                step falls below this value.
+            time_limit (float, optional): Stop after this many seconds of simulation.
+        """
+        self.max_mcs = max_mcs
+        self.grain_size = grain_size
+        self.energy_tolerance = energy_tolerance
+        self.time_limit = time_limit
+
+        self.start_time = None
+        self.last_mcs = None
+        self.last_energy = None
+
+    def start(self):
+        """Start the wall-clock timer."""
+        self.start_time = time.perf_counter()
+
+    def check(self, simulator):
+        """Check whether any stopping criterion is met.
+
+        Args:
+            simulator (Simulate | Simulate3D): Simulator to check.
+
+        Returns:
+            str: Reason for stopping, None if the simulation should continue.
+
+        """
+        if self.start_time is None:
+            self.start()
+
+        if self.time_limit and time.perf_counter() - self.start_time >= self.time_limit:
+            return f"time limit of {self.time_limit:g} s reached"
+
+        if self.max_mcs and simulator.mcs >= self.max_mcs:
+            return f"{self.max_mcs} MCS reached"
+
+        # Lattice-wide metrics are only checked once per Monte Carlo step
+        if simulator.mcs == self.last_mcs:
+            return None
+        self.last_mcs = simulator.mcs
+
+        if self.grain_size:
+            grain_size = simulator.mean_grain_size()
+            if grain_size >= self.grain_size:
+                return f"mean grain size of {grain_size:.1f} reached"
+
+        if self.energy_tolerance:
+            energy = simulator.total_energy()
+            last_energy, self.last_energy = self.last_energy, energy
+            if last_energy is not None and (
+                last_energy == 0
+                or abs(energy - last_energy) / abs(last_energy) < self.energy_tolerance
+            ):
+                return f"energy converged at {energy:g} after {simulator.mcs} MCS"
+
+        return None
@@ -0,0 +1,337 @@
+# Author: Neel Basak
+# Github: https://github.com/Neelfrost
+# File: viewport.py
+# License: GPL-3
+
+from math import ceil, floor, log2
+
+import numpy as np
+
+# Zoom limits, in pixels per cell
+MIN_ZOOM = 1 / 1024
+MAX_ZOOM = 64
+
+# Zoom factor applied per mouse wheel notch / key press
+ZOOM_STEP = 1.25
+
+# Samples taken along each axis of a block of cells when downsampling by majority
+MAJORITY_SAMPLES = 3
+
+# Bands (of block columns) the majority mipmap is split into, one band is refreshed per frame
+MAJORITY_BANDS = 8
+
+
+def majority(samples):
+    """Find the most common orientation among samples, for every pixel.
+
+    Args:
+        samples (ndarray): Orientations, shape: (samples, width, height).
+
+    Returns:
+        ndarray: Most common orientation (ties go to the lowest orientation), shape: (width, height).
+
+    """
+    ordered = np.sort(samples, axis=0)
+
+    most_common = ordered[0].copy()
+    longest_run = np.ones(ordered.shape[1:], dtype=np.int16)
+    run = np.ones(ordered.shape[1:], dtype=np.int16)
+
+    # Walk through the sorted samples, tracking the longest run of equal orientations
+    for previous, current in zip(ordered, ordered[1:]):
+        run = np.where(current == previous, run + 1, 1)
+        longer = run > longest_run
+        most_common = np.where(longer, current, most_common)
+        longest_run = np.maximum(longest_run, run)
+
+    return most_common
+
+
+class Viewport:
+    def __init__(self, width, height, cols, rows, zoom=1, sampling="strided"):
+        """A pannable, zoomable view of a lattice that may be larger than the window.
+
+        Only the visible region of the lattice is read. When zoomed out (less than a pixel per cell) the region is
+        downsampled to a mipmap level (power of two cells per pixel) by taking every n-th cell (strided) or the most
+        common orientation of a few cells within each block (majority), so rendering cost depends on the window size
+        rather than the lattice size.
+
+        Args:
+            width (int): Window width in pixels.
+            height (int): Window height in pixels.
+            cols (int): Number of columns of the lattice.
+            rows (int): Number of rows of the lattice.
+            zoom (float, optional): Initial zoom in pixels per cell. Default: 1.
+            sampling (str, optional): Downsampling method, "strided" or "majority". Default: strided.
+        """
+        self.width = width
+        self.height = height
+        self.cols = cols
+        self.rows = rows
+        self.sampling = sampling
+
+        self.zoom = zoom
+
+        # Lattice coordinates (in cells) shown at the top left corner of the window
+        self.x = 0.0
+        self.y = 0.0
+
+        # Majority mipmap of the visible region, kept between frames and refreshed a band at a time
+        self.mipmap = None
+        self.mipmap_key = None
+        self.mipmap_band = 0
+
+        self.clamp()
+
+    def clamp(self):
+        """Keep the zoom within limits, and the lattice within view. A lattice smaller than the window is centered."""
+        self.zoom = min(max(self.zoom, MIN_ZOOM), MAX_ZOOM)
+
+        view_cols = self.width / self.zoom
+        view_rows = self.height / self.zoom
+
+        if view_cols >= self.cols:
+            self.x = (self.cols - view_cols) / 2
+        else:
+            self.x = min(max(self.x, 0), self.cols - view_cols)
+
+        if view_rows >= self.rows:
+            self.y = (self.rows - view_rows) / 2
+        else:
+            self.y = min(max(self.y, 0), self.rows - view_rows)
+
+    def fit(self):
+        """Zoom out (or in) to show the whole lattice."""
+        self.zoom = min(self.width / self.cols, self.height / self.rows)
+        self.clamp()
+
+    def pan(self, dx, dy):
+        """Move the view by the given amount of pixels.
+
+        Args:
+            dx (float): Horizontal movement in pixels.
+            dy (float): Vertical movement in pixels.
+        """
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+        self.clamp()
+
+    def zoom_at(self, factor, position=None):
+        """Zoom by the given factor, keeping the cell under the given window position in place.
+
+        Args:
+            factor (float): Zoom factor, > 1 to zoom in.
+            position (Tuple(int, int), optional): Window position in pixels. Default: window center.
+        """
+        px, py = position if position is not None else (self.width / 2, self.height / 2)
+
+        # Cell under the position before zooming
+        cell_x = self.x + px / self.zoom
+        cell_y = self.y + py / self.zoom
+
+        self.zoom *= factor
+        self.zoom = min(max(self.zoom, MIN_ZOOM), MAX_ZOOM)
+
+        self.x = cell_x - px / self.zoom
+        self.y = cell_y - py / self.zoom
+        self.clamp()
+
+    def toggle_sampling(self):
+        """Switch between strided and majority downsampling."""
+        self.sampling = "majority" if self.sampling == "strided" else "strided"
+        self.invalidate()
+
+    def invalidate(self):
+        """Discard the cached majority mipmap, e.g. when a different slice of the lattice is shown."""
+        self.mipmap_key = None
+
+    def handle_event(self, event):
+        """Pan with the mouse (drag) or W/A/S/D keys, zoom with the mouse wheel or +/- keys, fit the lattice in view
+        with F, and switch downsampling method with M.
+
+        Args:
+            event (pygame.event.Event): Pygame event.
+
+        Returns:
+            bool: True if the event was handled.
+        """
+        import pygame as pg
+
+        if event.type == pg.MOUSEWHEEL:
+            self.zoom_at(ZOOM_STEP**event.y, pg.mouse.get_pos())
+        elif event.type == pg.MOUSEMOTION and event.buttons[0]:
+            self.pan(-event.rel[0], -event.rel[1])
+        elif event.type == pg.KEYDOWN:
+            # Pan by a tenth of the window
+            step = min(self.width, self.height) / 10
+            movement = {
+                pg.K_w: (0, -step),
+                pg.K_a: (-step, 0),
+                pg.K_s: (0, step),
+                pg.K_d: (step, 0),
+            }
+            if event.key in movement:
+                self.pan(*movement[event.key])
+            elif event.key in (pg.K_PLUS, pg.K_EQUALS, pg.K_KP_PLUS):
+                self.zoom_at(ZOOM_STEP)
+            elif event.key in (pg.K_MINUS, pg.K_KP_MINUS):
+                self.zoom_at(1 / ZOOM_STEP)
+            elif event.key == pg.K_f:
+                self.fit()
+            elif event.key == pg.K_m:
+                self.toggle_sampling()
+            else:
+                return False
+        else:
+            return False
+
+        return True
+
+    def level(self):
+        """Mipmap level to sample at, as the number of cells per pixel (a power of two)."""
+        if self.zoom >= 1:
+            return 1
+        return 2 ** floor(log2(1 / self.zoom))
+
+    def visible_region(self):
+        """Region of the lattice within view.
+
+        Returns:
+            Tuple(int, int, int, int): First column, last column (exclusive), first row, last row (exclusive).
+        """
+        x0 = max(floor(self.x), 0)
+        y0 = max(floor(self.y), 0)
+        x1 = min(ceil(self.x + self.width / self.zoom), self.cols)
+        y1 = min(ceil(self.y + self.height / self.zoom), self.rows)
+        return x0, x1, y0, y1
+
+    def sample(self, matrix):
+        """Read the visible region of the lattice at the current mipmap level.
+
+        Args:
+            matrix (Matrix2D | Matrix3D): Lattice to read from, must provide region().
+
+        Returns:
+            Tuple(ndarray, int, int, int): Orientations, first column, first row, cells per sample.
+        """
+        x0, x1, y0, y1 = self.visible_region()
+        step = self.level()
+
+        # Align to the mipmap grid so that samples do not flicker while panning
+        x0 -= x0 % step
+        y0 -= y0 % step
+
+        if self.sampling == "majority" and step > 1:
+            return self.sample_majority(matrix, x0, x1, y0, y1, step), x0, y0, step
+
+        return matrix.region(x0, x1, y0, y1, step), x0, y0, step
+
+    def sample_majority(self, matrix, x0, x1, y0, y1, step):
+        """Downsample a region of the lattice by majority.
+
+        Majority sampling reads several cells per pixel, which is far slower than strided sampling for large lattices.
+        The mipmap is therefore kept between frames, and only one band of it is refreshed per frame. When the region
+        changes (pan, zoom), the mipmap starts out as the strided sample and is refined band by band.
+
+        Args:
+            matrix (Matrix2D | Matrix3D): Lattice to read from, must provide region().
+            x0 (int): First column, aligned to step.
+            x1 (int): Last column (exclusive).
+            y0 (int): First row, aligned to step.
+            y1 (int): Last row (exclusive).
+            step (int): Cells per sample.
+
+        Returns:
+            ndarray: Most common orientation within each block of step x step cells.
+        """
+        key = (x0, x1, y0, y1, step)
+        if self.mipmap_key != key:
+            self.mipmap = np.array(matrix.region(x0, x1, y0, y1, step))
+            self.mipmap_key = key
+            self.mipmap_band = 0
+            return self.mipmap
+
+        # Evenly spaced samples within each block of step x step cells, the spacing must divide step so that every
+        # block is sampled at the same offsets
+        samples = min(step, MAJORITY_SAMPLES)
+        spacing = step // samples
+        while step % spacing:
+            spacing -= 1
+        blocks = step // spacing
+
+        columns = self.mipmap.shape[0]
+        band = ceil(columns / MAJORITY_BANDS)
+        first = self.mipmap_band * band
+        self.mipmap_band = (self.mipmap_band + 1) % MAJORITY_BANDS
+        if first >= columns:
+            return self.mipmap
+
+        # Read the band once, and pick the samples at each offset within the blocks out of it
+        cells = matrix.region(
+            x0 + first * step, min(x0 + (first + band) * step, x1), y0, y1, spacing
+        )
+        offsets = [
+            cells[i::blocks, j::blocks] for i in range(samples) for j in range(samples)
+        ]
+
+        # Blocks at the far edges of the lattice may be missing samples, they keep the strided sample
+        width = min(offset.shape[0] for offset in offsets)
+        height = min(offset.shape[1] for offset in offsets)
+        self.mipmap[first : first + width, :height] = majority(
+            np.stack([offset[:width, :height] for offset in offsets])
+        )
+
+        return self.mipmap
+
+    def capture(self, matrix):
+        """Copy the visible region of the lattice at the current mipmap level, so that it can be drawn later while the
+        lattice keeps changing (e.g. by the simulation worker).
+
+        Args:
+            matrix (Matrix2D | Matrix3D): Lattice to read from, must provide region().
+
+        Returns:
+            Tuple(ndarray, int, int, int): Orientations, first column, first row, cells per sample.
+        """
+        region, x0, y0, step = self.sample(matrix)
+        return np.array(region), x0, y0, step
+
+    def render(self, canvas, matrix, colored=False):
+        """Draw the visible region of the lattice.
+
+        Args:
+            canvas (pygame.display): Pygame display.
+            matrix (Matrix2D | Matrix3D): Lattice to draw.
+            colored (boolean): Should grains be colored? Default: grayscale grains.
+        """
+        self.draw(canvas, matrix.palette, self.sample(matrix), colored)
+
+    def draw(self, canvas, palette, frame, colored=False):
+        """Draw a previously sampled region of the lattice at the current pan and zoom.
+
+        Args:
+            canvas (pygame.display): Pygame display.
+            palette (Palette): Colors of the lattice.
+            frame (Tuple(ndarray, int, int, int)): Region as returned by sample() or capture().
+            colored (boolean): Should grains be colored? Default: grayscale grains.
+        """
+        import pygame as pg
+
+        region, x0, y0, step = frame
+        if region.size == 0:
+            return
+
+        surface = pg.surfarray.make_surface(palette.apply(region, colored))
+        surface = pg.transform.scale(
+            surface,
+            (
+                max(round(region.shape[0] * step * self.zoom), 1),
+                max(round(region.shape[1] * step * self.zoom), 1),
+            ),
+        )
+
+        canvas.fill((0, 0, 0))
+        canvas.blit(
+            surface,
+            (round((x0 - self.x) * self.zoom), round((y0 - self.y) * self.zoom)),
+        )
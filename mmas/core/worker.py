@@ -0,0 +1,100 @@
+# Author: Neel Basak
+# Github: https://github.com/Neelfrost
+# File: worker.py
+# License: GPL-3
+
+import threading
+import time
+
+
+class SimulationWorker(threading.Thread):
+    def __init__(self, matrix, scheduler, criteria=None, capture=None):
+        """Background thread that advances the simulation independently of the display frame rate.
+
+        The worker repeatedly calls matrix.simulate() with batches sized by the scheduler until stopped, or until a
+        stopping criterion is met. Every batch is run while holding `lock`. The display does not read the lattice
+        while the worker runs, instead it draws the frames published by the worker between batches, so it never waits
+        for a batch to finish.
+
+        Args:
+            matrix (Matrix2D | Matrix3D): Discrete matrix mapped to a microstructure.
+            scheduler (Scheduler): Sizes and paces simulation batches.
+            criteria (StoppingCriteria, optional): Criteria checked after every batch.
+            capture (callable, optional): Copies the part of the lattice the display needs, called with the matrix.
+                Default: no frames are published.
+        """
+        super().__init__(name="mmas-simulation", daemon=True)
+        self.matrix = matrix
+        self.scheduler = scheduler
+        self.criteria = criteria
+        self.capture = capture
+
+        # Reason the simulation stopped by itself (a stopping criterion was met), None otherwise.
+        self.reason = None
+
+        # Guards the lattice against concurrent reads (snapshots) and writes (simulation).
+        self.lock = threading.Lock()
+
+        # Latest published frame: Tuple(captured lattice state, MCS), None until the first one is published.
+        self.frame = None
+        self._frame_requested = threading.Event()
+        self._frame_requested.set()
+
+        self._stop_event = threading.Event()
+
+    def run(self):
+        """Simulate grain growth until stop() is called, or a stopping criterion is met."""
+        if self.criteria is not None:
+            self.criteria.start()
+
+        self.publish()
+
+        while not self._stop_event.is_set():
+            attempts = self.scheduler.batch_size()
+
+            with self.lock:
+                start = time.perf_counter()
+                attempts = self.matrix.simulate(simulate=True, attempts=attempts)
+                self.scheduler.record(attempts, time.perf_counter() - start)
+
+                if self.criteria is not None:
+                    self.reason = self.criteria.check(self.matrix.simulator)
+
+            # When advancing in fixed fractions of an MCS, only show the lattice once a whole fraction is done
+            if self.scheduler.step_complete():
+                self.publish()
+
+            if self.reason is not None:
+                break
+
+            # Wait when ahead of the target MCS rate, otherwise yield the GIL so that the display thread can run
+            # between batches.
+            delay = self.scheduler.delay()
+            if delay:
+                self._stop_event.wait(delay)
+            else:
+                time.sleep(0)
+
+    def publish(self):
+        """Publish a copy of the lattice state for the display, if it asked for a new frame."""
+        if self.capture is None or not self._frame_requested.is_set():
+            return
+
+        self._frame_requested.clear()
+        self.frame = self.capture(self.matrix), self.matrix.simulator.mcs
+
+    def latest_frame(self):
+        """Get the latest published frame, and ask for a new one after the current batch.
+
+        Returns:
+            Tuple(object, int): Captured lattice state and its MCS, None until the first frame is published.
+
+        """
+        self._frame_requested.set()
+        return self.frame
+
+    def stop(self):
+        """Signal the worker to stop and wait for the current batch to finish."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
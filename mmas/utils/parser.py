@@ -32,6 +32,8 @@ class CustomFormatter(argparse.HelpFormatter):
 
 def argparser():
     METHODS = ("pseudo", "sobol", "halton", "latin")
+    ENERGY_MODELS = ("uniform", "read-shockley")
+    MOBILITY_MODELS = ("uniform", "humphreys")
 
     parser = argparse.ArgumentParser(
         add_help=False,
@@ -64,6 +66,13 @@ def argparser():
         type=int,
         help="Define the grid cell size. Lower values result in sharper boundaries. (default: 5, recommended range: 1-10)",
     )
+    parser.add_argument(
+        "-s",
+        "--size",
+        default=0,
+        type=int,
+        help="Set the lattice size in cells, independent of the window size. Larger lattices can be panned (mouse drag, W/A/S/D) and zoomed (mouse wheel, +/-), F fits the lattice in view, M switches between strided and majority downsampling. (default: width / cell size)",
+    )
     parser.add_argument(
         "-o",
         "--orientations",
@@ -103,12 +112,81 @@ def argparser():
         type=float,
         help="Set the grain boundary energy. (default: 1)",
     )
+    parser.add_argument(
+        "--energy-model",
+        default="uniform",
+        choices=ENERGY_MODELS,
+        type=str,
+        help=f"Choose the grain boundary energy model. Allowed values are: {', '.join(ENERGY_MODELS)}. (default: uniform)",
+    )
+    parser.add_argument(
+        "--mobility-model",
+        default="uniform",
+        choices=MOBILITY_MODELS,
+        type=str,
+        help=f"Choose the grain boundary mobility model. Allowed values are: {', '.join(MOBILITY_MODELS)}. (default: uniform)",
+    )
+    parser.add_argument(
+        "--max-misorientation",
+        default=15,
+        type=float,
+        help="Set the misorientation (in degrees) separating low and high angle grain boundaries, used by the read-shockley and humphreys models. (default: 15)",
+    )
     parser.add_argument(
         "--simulate",
         default=False,
         help="Enable grain growth simulation. (default: false)",
         action="store_true",
     )
+    parser.add_argument(
+        "--periodic",
+        default=False,
+        help="Use periodic boundary conditions, i.e., the microstructure wraps around its edges. (default: false)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--mcs-rate",
+        default=0,
+        type=float,
+        help="Target number of Monte Carlo steps per second. (default: 0, as fast as possible)",
+    )
+    parser.add_argument(
+        "--mcs-fraction",
+        default=None,
+        type=float,
+        help="Advance the simulation in fixed fractions of a Monte Carlo step, the display is updated after each one. Simulation batches still last about one frame. (default: none)",
+    )
+    parser.add_argument(
+        "--max-mcs",
+        default=0,
+        type=int,
+        help="Stop the simulation after the specified number of Monte Carlo steps. (default: never)",
+    )
+    parser.add_argument(
+        "--grain-size",
+        default=0,
+        type=float,
+        help="Stop the simulation once the mean grain size (in cells) reaches the specified value. (default: never)",
+    )
+    parser.add_argument(
+        "--energy-tolerance",
+        default=0,
+        type=float,
+        help="Stop the simulation once the relative change in total grain boundary energy over one Monte Carlo step falls below the specified value. (default: never)",
+    )
+    parser.add_argument(
+        "--time-limit",
+        default=0,
+        type=float,
+        help="Stop the simulation after the specified number of seconds. (default: never)",
+    )
+    parser.add_argument(
+        "--3d",
+        dest="three_dimensional",
+        default=False,
+        help="Generate a cubic (three-dimensional) microstructure. A single slice is displayed at a time, use the Up/Down arrow keys to move through slices. (default: false)",
+        action="store_true",
+    )
     parser.add_argument(
         "--color",
         default=False,
@@ -120,7 +198,7 @@ def argparser():
         default=0,
         type=int,
         help=(
-            "Save snapshots of the microstructure at specified intervals (in seconds). Without simulation, only one snapshot is saved. (default: never)"
+            "Save snapshots of the microstructure at specified intervals (in seconds). Snapshots show the whole lattice (the displayed slice in 3D) at the cell size, or at one pixel per cell when it does not fit in the window. Without simulation, only one snapshot is saved. (default: never)"
         ),
     )
     parser.add_argument(
@@ -133,7 +211,7 @@ def argparser():
         "--load",
         type=str,
         help=(
-            "Load microstructure data from a file. This option can override or be combined with other options like --temperature, --grain, --boltz, --simulate, --color, and --snapshot."
+            "Load microstructure data from a file (.json for 2D, .npz for 3D microstructures). This option can override or be combined with other options like --temperature, --grain, --boltz, --simulate, --color, and --snapshot."
         ),
     )
     parser.add_argument(